@@ -1,16 +1,41 @@
 import os
-import sys
 import json
+import hashlib
+import argparse
+import functools
 import subprocess
 from pathlib import Path
-from dataclasses import asdict, dataclass
-from typing import Dict, List, Optional, TypedDict
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from typing import (
+    Any,
+    DefaultDict,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypedDict,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+CACHE_DIRECTORY = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "xcode-acknowledgements"
+)
+JSON_WRITE_BUFFER_SIZE = 1 << 18
 
 
 def main():
     arguments = parse_arguments()
 
-    packages_directory = get_packages_directory(scheme=arguments["scheme"])
+    packages_directory = get_packages_directory(scheme=arguments.scheme)
     packages_licenses = get_packages_licenses(packages_directory=packages_directory)
 
     package_file_content = decode_package_file()
@@ -18,22 +43,46 @@ def main():
         package_file_content=package_file_content, packages_licenses=packages_licenses
     )
 
-    contributors_list = subprocess.getoutput(
-        f'git log "--pretty=format:%an <%ae>"'
-    ).splitlines()
-    formatted_contributors = format_contributors(contributors_list=contributors_list)
+    with subprocess.Popen(
+        [
+            "git",
+            "shortlog",
+            "-sne",
+            "--all",
+            "--no-merges",
+            f"--max-count={arguments.max_contributors_scan}",
+        ],
+        stdout=subprocess.PIPE,
+        env={**os.environ, "GIT_PAGER": "cat"},
+        text=True,
+        bufsize=1 << 16,
+    ) as git_shortlog:
+        formatted_contributors = format_contributors(
+            contributors_list=git_shortlog.stdout
+        )
+    if git_shortlog.returncode != 0:
+        raise subprocess.CalledProcessError(git_shortlog.returncode, git_shortlog.args)
+
     acknowledgements = Acknowledgements(
         packages=packages, contributors=formatted_contributors
     )
 
-    output_path = Path(arguments["output"]) / "Acknowledgements.json"
-    output_path.write_text(acknowledgements.to_json(indent=2))
+    output_path = Path(arguments.output) / "Acknowledgements.json"
+    acknowledgements.write_json(path=output_path, indent=2)
 
     print("done writing acknowledgements ✨")
 
 
-def format_contributors(contributors_list: List[str]):
-    """Returns formatted contributors
+def format_contributors(contributors_list: Iterable[str]):
+    """Returns formatted contributors from `git log` style `Name <email>` entries or
+    from `git shortlog -sne` style `<count>\\tName <email>` entries
+
+    >>> format_contributors(['     3\\tJohn <john@email.com>', '     1\\tJohn Smith <john.smith@email.com>', '     2\\tKent Clark <kent.clark@email.com>'])
+    [Contributor(name='John Smith', email=None, contributions=4), Contributor(name='Kent Clark', email=None, contributions=2)]
+
+    >>> import io
+    >>> format_contributors(io.StringIO('John <john@email.com>\\nJohn Smith <john.smith@email.com>\\n'))
+    [Contributor(name='John Smith', email=None, contributions=2)]
 
     >>> format_contributors({'John <john@email.com>', 'Kamaal <kamaal@email.com>', 'John Smith <john.smith@email.com>', 'Kamaal Farah <kamaal.farah@email.com>'})
     [Contributor(name='John Smith', email=None, contributions=2), Contributor(name='Kamaal Farah', email=None, contributions=2)]
@@ -45,135 +94,138 @@ def format_contributors(contributors_list: List[str]):
     [Contributor(name='John Smith', email=None, contributions=2), Contributor(name='Kamaal Farah', email=None, contributions=2), Contributor(name='Kent Clark', email=None, contributions=1)]
     """
 
-    contributor_names_mapped_by_emails: Dict[str, List[str]] = {}
+    # email -> [contributions, longest contributor name]
+    contributors_mapped_by_emails: DefaultDict[str, List] = defaultdict(lambda: [0, ""])
     for contributor_entry in contributors_list:
-        splitted_contributor_entry = contributor_entry.split("<")
-        contributor_name = (
-            "".join(splitted_contributor_entry[:-1])
-            .strip()
-            .replace("<", "")
-            .replace(">", "")
-        )
-        email = splitted_contributor_entry[-1].strip().replace("<", "").replace(">", "")
-
-        contributor_names_mapped_by_emails[
-            email
-        ] = contributor_names_mapped_by_emails.get(email, []) + [contributor_name]
-
-    contributors: List[Contributor] = []
-    for (email, contributor_names) in contributor_names_mapped_by_emails.items():
-        longest_contributor_name = ""
-
-        for contributor_name in contributor_names:
-            if contributor_name == "kamaal111" or contributor_name == "Kamaal":
-                contributor_name = "Kamaal Farah"
-            if len(contributor_name) > len(longest_contributor_name):
-                longest_contributor_name = contributor_name
-
-        contributors.append(
-            Contributor(
-                name=longest_contributor_name,
-                email=email,
-                contributions=len(contributor_names),
-            )
-        )
+        count, _, contributor_entry = contributor_entry.rpartition("\t")
+        contributor_name, _, email = contributor_entry.rstrip().rpartition("<")
+        contributor_name = contributor_name.strip()
+        if email.endswith(">"):
+            email = email[:-1]
 
-    merged_contributors: List[Contributor] = []
-    for contributor in contributors:
-        contributor_first_names_names = map(
-            lambda contributor: contributor.first_name, merged_contributors
-        )
-        if contributor.first_name in contributor_first_names_names:
-            for (index, merged_author) in enumerate(merged_contributors):
-                first_name_is_the_same = (
-                    contributor.first_name == merged_author.first_name
-                )
-                name_is_the_same = contributor.name == merged_author.name
-
-                one_of_authors_has_just_a_single_name = (
-                    contributor.has_just_a_single_name
-                    or merged_author.has_just_a_single_name
-                ) and len(contributor.name_components) != len(
-                    merged_author.name_components
-                )
-
-                if first_name_is_the_same and (
-                    one_of_authors_has_just_a_single_name or name_is_the_same
-                ):
-                    if len(contributor.name) > len(merged_author.name):
-                        longest_author_name = contributor.name
-                    else:
-                        longest_author_name = merged_author.name
-
-                    merged_contributors[index] = Contributor(
-                        name=longest_author_name,
-                        email=None,
-                        contributions=contributor.contributions
-                        + merged_author.contributions,
-                    )
-        else:
-            contributor.email = None
-            merged_contributors.append(contributor)
-
-    return sorted(
-        sorted(merged_contributors, key=lambda contributor: contributor.name),
-        key=lambda contributor: contributor.contributions,
-        reverse=True,
-    )
+        contributions = int(count) if count else 1
 
+        if contributor_name == "kamaal111" or contributor_name == "Kamaal":
+            contributor_name = "Kamaal Farah"
 
-def parse_arguments():
-    arguments: Arguments = {}
+        contributor_slot = contributors_mapped_by_emails[email]
+        contributor_slot[0] += contributions
+        contributor_slot[1] = max(contributor_slot[1], contributor_name, key=len)
 
-    skip_next_value = False
-    for index, arg in enumerate(sys.argv[1:]):
-        if skip_next_value:
-            skip_next_value = False
+    merged_contributors: List[Contributor] = []
+    merged_contributors_indices_by_first_name: Dict[str, int] = {}
+    for contributions, contributor_name in contributors_mapped_by_emails.values():
+        contributor = Contributor(
+            name=contributor_name, email=None, contributions=contributions
+        )
+        first_name = contributor.first_name
+        index = merged_contributors_indices_by_first_name.get(first_name)
+        if index is None:
+            merged_contributors_indices_by_first_name[first_name] = len(
+                merged_contributors
+            )
+            merged_contributors.append(contributor)
             continue
 
-        def get_next_value():
-            if index + 1 < len(sys.argv):
-                nonlocal skip_next_value
-                skip_next_value = True
+        merged_author = merged_contributors[index]
+        name_is_the_same = contributor_name == merged_author.name
 
-                return sys.argv[index + 2]
+        one_of_authors_has_just_a_single_name = (
+            contributor.has_just_a_single_name or merged_author.has_just_a_single_name
+        ) and len(contributor.name_components) != len(merged_author.name_components)
 
-        if arg == "--scheme" and (scheme := get_next_value()):
-            arguments["scheme"] = scheme
-        if arg == "--output" and (output := get_next_value()):
-            arguments["output"] = output
+        if one_of_authors_has_just_a_single_name or name_is_the_same:
+            merged_contributors[index] = Contributor(
+                name=max(merged_author.name, contributor_name, key=len),
+                email=None,
+                contributions=contributions + merged_author.contributions,
+            )
 
-    if arguments.get("scheme") is None:
-        raise Exception("Please provide a scheme with the --scheme flag")
+    return sorted(
+        merged_contributors,
+        key=lambda contributor: (-contributor.contributions, contributor.name),
+    )
 
-    if arguments.get("output") is None:
-        raise Exception("Please provide a output path with the --output flag")
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Writes an Acknowledgements.json for an Xcode project"
+    )
+    parser.add_argument("--scheme", required=True, help="scheme of the Xcode project")
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="directory to write Acknowledgements.json to",
+    )
+    parser.add_argument(
+        "--max-contributors-scan",
+        type=int,
+        default=50_000,
+        help=(
+            "only count contributors from the most recent N commits, which keeps "
+            "large histories fast at the cost of missing older contributors; "
+            "-1 scans the whole history (default: %(default)s)"
+        ),
+    )
+    arguments = parser.parse_args()
+    if arguments.max_contributors_scan == 0 or arguments.max_contributors_scan < -1:
+        parser.error("--max-contributors-scan must be a positive number or -1")
 
     return arguments
 
 
 def get_path_from_root_ending_with(search_string: str) -> Optional[str]:
     current_work_directory = os.getcwd()
-    root_files = os.listdir(current_work_directory)
+    root_files = list_directory(directory=current_work_directory)
 
     for file in root_files:
         if file.endswith(search_string):
             return file
 
 
+@functools.lru_cache(maxsize=None)
+def list_directory(directory: str) -> Tuple[str, ...]:
+    with os.scandir(directory) as entries:
+        return tuple(entry.name for entry in entries)
+
+
 def get_packages_licenses(packages_directory: str):
-    licenses: Dict[str, str] = {}
-    for root, _, files in os.walk(packages_directory):
-        if "LICENSE" not in files:
-            continue
+    license_paths: Dict[str, str] = {}
+    try:
+        with os.scandir(packages_directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    license_paths[entry.name] = os.path.join(entry.path, "LICENSE")
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+    def read_package_license(license_path: str) -> Optional[str]:
+        try:
+            return read_license(path=license_path)
+        except OSError:
+            return None
+
+    if len(license_paths) <= 4:
+        license_contents = map(read_package_license, license_paths.values())
+    else:
+        # concurrent.futures pulls in logging, so only import it when the pool is used
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(32, len(license_paths))) as executor:
+            license_contents = list(
+                executor.map(read_package_license, license_paths.values())
+            )
 
-        package_name = root.split("/")[-1]
+    return {
+        package_name: license_content
+        for package_name, license_content in zip(license_paths.keys(), license_contents)
+        if license_content is not None
+    }
 
-        license_path = os.path.join(root, "LICENSE")
-        with open(license_path, "r") as file:
-            licenses[package_name] = file.read()
 
-    return licenses
+def read_license(path: str) -> str:
+    with open(path, "rb", buffering=0) as file:
+        return file.read().decode("utf-8", errors="replace")
 
 
 def package_file_content_to_acknowledgments(
@@ -183,11 +235,8 @@ def package_file_content_to_acknowledgments(
     if package_object := package_file_content.get("object"):
         for pin in package_object["pins"]:
             package_name = pin["package"]
-            url = pin["repositoryURL"]
-            if url.endswith(".git"):
-                url = url[:-4]
-
-            author = url.split("/")[-2]
+            url = pin["repositoryURL"].rstrip("/").removesuffix(".git")
+            author = url.rsplit("/", 2)[-2]
 
             acknowledgement = AcknowledgementPackage(
                 name=package_name,
@@ -198,11 +247,8 @@ def package_file_content_to_acknowledgments(
             packages.append(acknowledgement)
     else:
         for pin in package_file_content["pins"]:
-            url = pin["location"]
-            if url.endswith(".git"):
-                url = url[:-4]
-
-            url_split_by_separator = url.split("/")
+            url = pin["location"].rstrip("/").removesuffix(".git")
+            url_split_by_separator = url.rsplit("/", 2)
             package_name = url_split_by_separator[-1]
             author = url_split_by_separator[-2]
             acknowledgement = AcknowledgementPackage(
@@ -219,7 +265,7 @@ def package_file_content_to_acknowledgments(
 def decode_package_file() -> "PackageFileContent":
     if workspace_path := get_path_from_root_ending_with(search_string=".xcworkspace"):
         path = Path(workspace_path) / "xcshareddata" / "swiftpm" / "Package.resolved"
-        return json.loads(path.read_text())
+        return json_loads(path.read_bytes())
 
     raise Exception("Workspace not found at root")
 
@@ -229,55 +275,150 @@ def get_packages_directory(scheme: str):
     if project_path is None:
         raise Exception("Project not found at root")
 
-    output = subprocess.getoutput(
-        f'xcodebuild -project {project_path} -target "{scheme}" -showBuildSettings'
+    project_file_modified_time = os.stat(
+        os.path.join(project_path, "project.pbxproj")
+    ).st_mtime_ns
+    cache_key = hashlib.blake2b(
+        "|".join(
+            (os.path.abspath(project_path), scheme, str(project_file_modified_time))
+        ).encode(),
+        digest_size=16,
+    ).hexdigest()
+    cache_path = CACHE_DIRECTORY / f"packages-directory-{cache_key}"
+    try:
+        cached_packages_directory = cache_path.read_text()
+    except (OSError, UnicodeDecodeError):
+        cached_packages_directory = None
+    if cached_packages_directory and os.path.isdir(cached_packages_directory):
+        return cached_packages_directory
+
+    packages_directory = build_packages_directory(
+        project_path=project_path, scheme=scheme
+    )
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(packages_directory)
+    except OSError:
+        pass
+
+    return packages_directory
+
+
+def build_packages_directory(project_path: str, scheme: str):
+    xcodebuild = subprocess.run(
+        [
+            "xcodebuild",
+            "-project",
+            project_path,
+            "-target",
+            scheme,
+            "-showBuildSettings",
+            "-json",
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
     )
 
-    output_search_line = "    BUILD_DIR = "
-    for line in output.splitlines():
-        if output_search_line in line:
-            return line.replace(output_search_line, "").replace(
-                "Build/Products", "SourcePackages/checkouts"
-            )
+    for target_build_settings in json_loads(xcodebuild.stdout):
+        if build_directory := target_build_settings["buildSettings"].get("BUILD_DIR"):
+            return build_directory.replace("Build/Products", "SourcePackages/checkouts")
+
+    raise Exception("Build directory not found in xcodebuild build settings")
+
+
+def dataclass_to_dict(value) -> Dict[str, Any]:
+    """Returns the `__init__` fields of a dataclass as a shallow dictionary
+
+    >>> dataclass_to_dict(Contributor(name='Kamaal Farah', email=None, contributions=2))
+    {'name': 'Kamaal Farah', 'email': None, 'contributions': 2}
+    """
 
-    raise Exception(f"Build directory not found from {output=}")
+    return {
+        dataclass_field.name: getattr(value, dataclass_field.name)
+        for dataclass_field in fields(value)
+        if dataclass_field.init
+    }
 
 
-@dataclass
+def get_orjson_option(indent: Optional[int]) -> Optional[int]:
+    if orjson is None or indent not in (None, 2):
+        return None
+
+    option = orjson.OPT_PASSTHROUGH_DATACLASS
+    if indent is not None:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+
+@dataclass(slots=True)
 class Acknowledgements:
     packages: List["AcknowledgementPackage"]
     contributors: List["Contributor"]
 
     def to_dict(self):
-        dictionary_to_return = {}
-        for key, value in asdict(self).items():
-            dictionary_to_return[key] = value
-        return dictionary_to_return
+        return {
+            "packages": list(map(dataclass_to_dict, self.packages)),
+            "contributors": list(map(dataclass_to_dict, self.contributors)),
+        }
 
     def to_json(self, indent: Optional[int] = None):
-        return json.dumps(self.to_dict(), indent=indent)
+        """Returns the acknowledgements as JSON, using orjson when it is installed
+
+        >>> acknowledgements = Acknowledgements(
+        ...     packages=[AcknowledgementPackage(name='Pkg', url='https://github.com/kamaal111/Pkg', author='kamaal111', license=None)],
+        ...     contributors=[Contributor(name='Kamaal Farah', email=None, contributions=2)],
+        ... )
+        >>> json.loads(acknowledgements.to_json(indent=2)) == acknowledgements.to_dict()
+        True
+        >>> acknowledgements.to_dict()['contributors']
+        [{'name': 'Kamaal Farah', 'email': None, 'contributions': 2}]
+        """
+
+        if (option := get_orjson_option(indent=indent)) is not None:
+            return orjson.dumps(self, option=option, default=dataclass_to_dict).decode()
+
+        return json.dumps(
+            self, indent=indent, default=dataclass_to_dict, ensure_ascii=False
+        )
+
+    def write_json(self, path: Path, indent: Optional[int] = None):
+        if (option := get_orjson_option(indent=indent)) is not None:
+            data = orjson.dumps(self, option=option, default=dataclass_to_dict)
+            with open(path, "wb", buffering=JSON_WRITE_BUFFER_SIZE) as file:
+                file.write(data)
+            return
+
+        with open(
+            path, "w", encoding="utf-8", buffering=JSON_WRITE_BUFFER_SIZE
+        ) as file:
+            json.dump(
+                self, file, indent=indent, default=dataclass_to_dict, ensure_ascii=False
+            )
 
 
-@dataclass
+@dataclass(slots=True)
 class Contributor:
+    """A contributor whose name components are split once on creation
+
+    >>> contributor = Contributor(name='Kamaal Farah', email=None, contributions=2)
+    >>> contributor.first_name, contributor.name_components, contributor.has_just_a_single_name
+    ('Kamaal', ('Kamaal', 'Farah'), False)
+    """
+
     name: str
     email: Optional[str]
     contributions: int
+    name_components: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+    first_name: str = field(init=False, repr=False, compare=False)
+    has_just_a_single_name: bool = field(init=False, repr=False, compare=False)
 
-    @property
-    def first_name(self):
-        return self.name_components[0]
-
-    @property
-    def name_components(self):
-        return self.name.split(" ")
+    def __post_init__(self):
+        self.name_components = tuple(self.name.split(" "))
+        self.first_name = self.name_components[0]
+        self.has_just_a_single_name = len(self.name_components) == 1
 
-    @property
-    def has_just_a_single_name(self):
-        return len(self.name_components) == 1
 
-
-@dataclass
+@dataclass(slots=True)
 class AcknowledgementPackage:
     name: str
     url: str
@@ -285,11 +426,6 @@ class AcknowledgementPackage:
     license: Optional[str]
 
 
-class Arguments(TypedDict):
-    scheme: str
-    output: str
-
-
 class PackageFileContentObjectPinState(TypedDict):
     branch: Optional[str]
     revision: str
@@ -319,4 +455,5 @@ class PackageFileContent(TypedDict):
     pins: Optional[List[PackageFileContentPin]]
 
 
-main()
+if __name__ == "__main__":
+    main()